@@ -1,16 +1,20 @@
 from __future__ import annotations
 
+import asyncio
+import codecs
 import csv
-import json
+import logging
+import mmap
 import os
-import threading
-import time
+from array import array
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
+import orjson
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 DEFAULT_DATA_PATHS = [
     Path(__file__).resolve().parent / "NIFTY_historical_data.csv",
@@ -18,26 +22,116 @@ DEFAULT_DATA_PATHS = [
 ]
 DATA_PATH = Path(os.getenv("CSV_PATH", "")).expanduser() if os.getenv("CSV_PATH") else None
 UPDATE_INTERVAL_SECONDS = 60
+UTF8_CHECK_CHUNK_BYTES = 1 << 20
 DEFAULT_STATE_PATH = Path(os.getenv("STATE_PATH", "backend_state.json")).expanduser()
 
+logger = logging.getLogger(__name__)
+
 
 class CsvRowRotator:
     def __init__(self, csv_path: Path | None) -> None:
         self.csv_path = self._resolve_path(csv_path)
         self.headers: List[str] = []
-        self.rows: List[List[str]] = []
-        self.index = 0
-        self.lock = threading.Lock()
+        self._mm: mmap.mmap | None = None
+        self._row_offsets = array("Q")
+        self._current: Tuple[int, Dict[str, str]] = (0, {})
+        self._state_path = DEFAULT_STATE_PATH
+        self._tmp_state_path = DEFAULT_STATE_PATH.with_name(DEFAULT_STATE_PATH.name + ".tmp")
+        self._state_dir_ready = False
+        self._last_persisted_index = -1
+        self._task: asyncio.Task[None] | None = None
         self._load_csv()
-        self._load_state()
+        index = self._load_state()
+        self._current = (index, self._build_row(index))
 
     def _load_csv(self) -> None:
-        with self.csv_path.open("r", encoding="utf-8-sig", newline="") as file:
-            reader = csv.reader(file)
-            self.headers = next(reader)
-            self.rows = [row for row in reader if row]
-        if not self.rows:
+        with self.csv_path.open("rb") as file:
+            mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._index_rows(mm)
+        except (ValueError, csv.Error):
+            mm.close()
+            raise
+        self._mm = mm
+
+    def _index_rows(self, mm: mmap.mmap) -> None:
+        # Rows are located by splitting on b"\n", so lines that csv.reader
+        # would join or split differently (quoted line breaks, bare \r) are
+        # rejected here rather than surfacing on a later rotation.
+        self._check_utf8(mm)
+        needs_check = mm.find(b'"') != -1 or mm.find(b"\r") != -1
+        size = len(mm)
+        header_end = mm.find(b"\n")
+        if header_end == -1:
+            header_end = size
+        if needs_check:
+            self._check_line(mm[:header_end], 1)
+        header_line = mm[:header_end].decode("utf-8-sig")
+        self.headers = next(csv.reader([header_line]))
+
+        # Only the start offset of each non-blank line is kept; rows are
+        # parsed from the mapping when they become current.
+        offsets = array("Q")
+        pos = header_end + 1
+        line_no = 1
+        while pos < size:
+            line_no += 1
+            end = mm.find(b"\n", pos)
+            if end == -1:
+                end = size
+            if end - pos > 1 or (end > pos and mm[pos] != 0x0D):
+                if needs_check:
+                    self._check_line(mm[pos:end], line_no)
+                offsets.append(pos)
+            pos = end + 1
+        if not offsets:
             raise ValueError("CSV file contains no data rows")
+        self._row_offsets = offsets
+
+    @staticmethod
+    def _check_utf8(mm: mmap.mmap) -> None:
+        # Rows are decoded only when they become current, so validate the
+        # whole file up front instead of failing on a later rotation.
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        size = len(mm)
+        for start in range(0, size, UTF8_CHECK_CHUNK_BYTES):
+            end = min(start + UTF8_CHECK_CHUNK_BYTES, size)
+            pending = len(decoder.getstate()[0])
+            try:
+                decoder.decode(mm[start:end], final=end == size)
+            except UnicodeDecodeError as exc:
+                offset = start - pending + exc.start
+                line_no = mm[:offset].count(b"\n") + 1
+                raise ValueError(f"CSV line {line_no} is not valid UTF-8") from None
+
+    @staticmethod
+    def _check_line(line: bytes, line_no: int) -> None:
+        if line.endswith(b"\r"):
+            line = line[:-1]
+        if b"\r" in line:
+            raise ValueError(
+                f"CSV line {line_no} contains a carriage return that does not end "
+                "the line; rows must use LF or CRLF line endings"
+            )
+        # An odd quote count is only a problem when a quoted field is left
+        # open, which makes csv.reader pull the next line into this row.
+        if line.count(b'"') % 2:
+            text = line.decode("utf-8-sig")
+            if len(list(csv.reader([text, ""]))) == 1:
+                raise ValueError(
+                    f"CSV line {line_no} ends inside a quoted field; "
+                    "quoted fields containing line breaks are not supported"
+                )
+
+    def _read_row(self, index: int) -> List[str]:
+        start = self._row_offsets[index]
+        end = self._mm.find(b"\n", start)
+        if end == -1:
+            end = len(self._mm)
+        return next(csv.reader([self._mm[start:end].decode("utf-8")]))
+
+    def _build_row(self, index: int) -> Dict[str, str]:
+        return dict(zip(self.headers, self._read_row(index)))
 
     def _resolve_path(self, csv_path: Path | None) -> Path:
         if csv_path and csv_path.exists():
@@ -49,48 +143,75 @@ class CsvRowRotator:
             "CSV file not found. Set CSV_PATH env or include NIFTY_historical_data.csv in backend/"
         )
 
-    def _load_state(self) -> None:
-        if not DEFAULT_STATE_PATH.exists():
-            return
+    def _load_state(self) -> int:
+        if not self._state_path.exists():
+            return 0
         try:
-            state = json.loads(DEFAULT_STATE_PATH.read_text(encoding="utf-8"))
+            state = orjson.loads(self._state_path.read_bytes())
             index = int(state.get("index", 0))
-        except (ValueError, TypeError, json.JSONDecodeError):
-            return
-        with self.lock:
-            self.index = index % len(self.rows)
+        except (ValueError, TypeError, orjson.JSONDecodeError):
+            return 0
+        if 0 <= index < len(self._row_offsets):
+            self._last_persisted_index = index
+        return index % len(self._row_offsets)
 
-    def _save_state(self) -> None:
-        DEFAULT_STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
-        DEFAULT_STATE_PATH.write_text(
-            json.dumps({"index": self.index}), encoding="utf-8"
-        )
+    def _save_state(self, index: int) -> None:
+        if index == self._last_persisted_index:
+            return
+        if not self._state_dir_ready:
+            self._state_path.parent.mkdir(parents=True, exist_ok=True)
+            self._state_dir_ready = True
+        self._tmp_state_path.write_bytes(orjson.dumps({"index": index}))
+        os.replace(self._tmp_state_path, self._state_path)
+        self._last_persisted_index = index
 
     def get_current(self) -> Dict[str, str]:
-        with self.lock:
-            row = self.rows[self.index]
-            return dict(zip(self.headers, row))
+        return self._current[1]
+
+    def snapshot(self) -> Tuple[int, Dict[str, str]]:
+        return self._current
 
     def get_index(self) -> int:
-        with self.lock:
-            return self.index
+        return self._current[0]
 
     def get_total(self) -> int:
-        return len(self.rows)
+        return len(self._row_offsets)
 
     def advance(self) -> None:
-        with self.lock:
-            self.index = (self.index + 1) % len(self.rows)
-            self._save_state()
+        index = (self._current[0] + 1) % len(self._row_offsets)
+        self._current = (index, self._build_row(index))
+        # The state write is a few hundred bytes once per interval, so it is
+        # done inline on the event loop rather than handed to a thread.
+        self._save_state(index)
 
     def start(self) -> None:
-        thread = threading.Thread(target=self._run_loop, daemon=True)
-        thread.start()
+        self._task = asyncio.create_task(self._run_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                logger.exception("Rotation task failed")
+            self._task = None
+        try:
+            self._save_state(self.get_index())
+        except OSError:
+            logger.exception("Failed to save rotator state on shutdown")
 
-    def _run_loop(self) -> None:
+    async def _run_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time() + UPDATE_INTERVAL_SECONDS
         while True:
-            time.sleep(UPDATE_INTERVAL_SECONDS)
-            self.advance()
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            try:
+                self.advance()
+            except Exception:
+                logger.exception("Failed to advance CSV row")
+            next_tick += UPDATE_INTERVAL_SECONDS
 
 
 rotator = CsvRowRotator(DATA_PATH)
@@ -100,12 +221,15 @@ rotator = CsvRowRotator(DATA_PATH)
 async def lifespan(app: FastAPI):
     rotator.start()
     yield
+    await rotator.stop()
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 raw_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000")
-allowed_origins = [origin.strip() for origin in raw_origins.split(",") if origin.strip()]
+allowed_origins = list(
+    dict.fromkeys(origin.strip() for origin in raw_origins.split(",") if origin.strip())
+)
 allow_credentials = "*" not in allowed_origins
 
 app.add_middleware(
@@ -117,15 +241,18 @@ app.add_middleware(
 )
 
 
-@app.get("/health")
-def health() -> Dict[str, str]:
+@app.get("/health", response_model=None)
+async def health() -> Dict[str, str]:
     return {"status": "ok"}
 
 
-@app.get("/row")
-def get_row() -> Dict[str, object]:
-    return {
-        "index": rotator.get_index(),
-        "total": rotator.get_total(),
-        "row": rotator.get_current(),
-    }
+@app.get("/row", response_model=None)
+async def get_row() -> ORJSONResponse:
+    index, row = rotator.snapshot()
+    return ORJSONResponse(
+        {
+            "index": index,
+            "total": rotator.get_total(),
+            "row": row,
+        }
+    )